@@ -0,0 +1,426 @@
+-- migrations/001_partition_time_series.sql
+-- Loan Default Prediction Project
+-- Convierte payments, delinquencies y predictions (tablas append-only que crecen sin límite)
+-- en tablas particionadas por rango mensual sobre su columna de fecha:
+--   payments       -> payment_date
+--   delinquencies  -> as_of_date
+--   predictions    -> snapshot_date
+-- Además:
+--   * Reemplaza los B-tree de fecha por índices BRIN (baratos y diminutos en datos append-only).
+--   * Crea funciones para crear particiones automáticamente y aplicar retención
+--     eliminando particiones completas (DROP TABLE) en lugar de DELETE masivos.
+--   * Recrea las vistas que dependen de estas tablas.
+--
+-- Requisitos: PostgreSQL 13+ y schema.sql aplicado previamente.
+-- La migración corre en una sola transacción y NO es reentrante: aborta si ya se aplicó.
+-- Uso: psql -v ON_ERROR_STOP=1 -f migrations/001_partition_time_series.sql
+
+BEGIN;
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('payments')) THEN
+    RAISE EXCEPTION 'La migración 001 ya fue aplicada (payments ya está particionada)';
+  END IF;
+END$$;
+
+-- ==========================
+-- Configuración de particionado
+-- ==========================
+-- Una fila por tabla particionada. retention_months = NULL conserva toda la historia.
+CREATE TABLE IF NOT EXISTS time_partition_config (
+    parent_table varchar(100) PRIMARY KEY,
+    partition_column varchar(100) NOT NULL,
+    premake_months integer NOT NULL DEFAULT 3, -- meses futuros que se crean por adelantado
+    retention_months integer,                  -- meses completos a conservar (además del actual)
+    CONSTRAINT chk_premake_nonnegative CHECK (premake_months >= 0),
+    CONSTRAINT chk_retention_positive CHECK (retention_months IS NULL OR retention_months > 0)
+);
+
+INSERT INTO time_partition_config (parent_table, partition_column) VALUES
+    ('payments', 'payment_date'),
+    ('delinquencies', 'as_of_date'),
+    ('predictions', 'snapshot_date')
+ON CONFLICT (parent_table) DO NOTHING;
+
+-- Ejemplo de retención (conservar 24 meses de pagos):
+-- UPDATE time_partition_config SET retention_months = 24 WHERE parent_table = 'payments';
+
+-- ==========================
+-- Función: create_monthly_partitions
+-- ==========================
+-- Crea (si no existen) las particiones mensuales <tabla>_pYYYYMM que cubren [p_from, p_to].
+-- Si la partición default ya contiene filas de un mes nuevo, se mueven a la partición creada.
+-- Devuelve el número de particiones creadas.
+CREATE OR REPLACE FUNCTION create_monthly_partitions(p_parent text, p_from date, p_to date)
+RETURNS integer AS $$
+DECLARE
+  v_parent regclass := p_parent::regclass;
+  v_schema text;
+  v_table text;
+  v_column text;
+  v_month date;
+  v_next date;
+  v_name text;
+  v_spill boolean;
+  v_created integer := 0;
+BEGIN
+  SELECT n.nspname, c.relname INTO v_schema, v_table
+  FROM pg_class c
+  JOIN pg_namespace n ON n.oid = c.relnamespace
+  WHERE c.oid = v_parent;
+
+  SELECT partition_column INTO v_column
+  FROM time_partition_config
+  WHERE parent_table = v_table;
+
+  IF v_column IS NULL THEN
+    RAISE EXCEPTION 'La tabla % no está registrada en time_partition_config', p_parent;
+  END IF;
+
+  v_month := date_trunc('month', p_from)::date;
+  WHILE v_month <= p_to LOOP
+    v_next := (v_month + interval '1 month')::date;
+    v_name := v_table || '_p' || to_char(v_month, 'YYYYMM');
+
+    IF to_regclass(format('%I.%I', v_schema, v_name)) IS NULL THEN
+      EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I.%I WHERE %I >= $1 AND %I < $2)',
+                     v_schema, v_table || '_default', v_column, v_column)
+        INTO v_spill USING v_month, v_next;
+
+      IF v_spill THEN
+        -- Postgres no permite crear la partición si la default tiene filas de ese rango.
+        EXECUTE format('CREATE TEMP TABLE _partition_spill (LIKE %s)', v_parent);
+        EXECUTE format('WITH moved AS (DELETE FROM %I.%I WHERE %I >= $1 AND %I < $2 RETURNING *) '
+                       'INSERT INTO _partition_spill SELECT * FROM moved',
+                       v_schema, v_table || '_default', v_column, v_column)
+          USING v_month, v_next;
+      END IF;
+
+      EXECUTE format('CREATE TABLE %I.%I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                     v_schema, v_name, v_parent, v_month, v_next);
+
+      IF v_spill THEN
+        EXECUTE format('INSERT INTO %s SELECT * FROM _partition_spill', v_parent);
+        DROP TABLE _partition_spill;
+      END IF;
+
+      v_created := v_created + 1;
+    END IF;
+
+    v_month := v_next;
+  END LOOP;
+
+  RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ==========================
+-- Función: drop_expired_partitions
+-- ==========================
+-- Retención por particiones: separa y elimina las particiones mensuales anteriores a
+-- (mes actual - p_retention_months). Las filas viejas que hayan caído en la partición
+-- default se borran con DELETE. Devuelve el número de particiones eliminadas.
+CREATE OR REPLACE FUNCTION drop_expired_partitions(p_parent text, p_retention_months integer)
+RETURNS integer AS $$
+DECLARE
+  v_parent regclass := p_parent::regclass;
+  v_schema text;
+  v_table text;
+  v_column text;
+  v_cutoff date;
+  v_child record;
+  v_dropped integer := 0;
+BEGIN
+  SELECT n.nspname, c.relname INTO v_schema, v_table
+  FROM pg_class c
+  JOIN pg_namespace n ON n.oid = c.relnamespace
+  WHERE c.oid = v_parent;
+
+  SELECT partition_column INTO v_column
+  FROM time_partition_config
+  WHERE parent_table = v_table;
+
+  IF v_column IS NULL THEN
+    RAISE EXCEPTION 'La tabla % no está registrada en time_partition_config', p_parent;
+  END IF;
+
+  v_cutoff := (date_trunc('month', current_date) - make_interval(months => p_retention_months))::date;
+
+  FOR v_child IN
+    SELECT n.nspname, c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE i.inhparent = v_parent
+      AND c.relname ~ ('^' || v_table || '_p[0-9]{6}$')
+      -- Comparación como texto (_pYYYYMM ordena cronológicamente): no depende del
+      -- orden en que el planner evalúe los filtros, a diferencia de un to_date().
+      AND c.relname < v_table || '_p' || to_char(v_cutoff, 'YYYYMM')
+    ORDER BY c.relname
+  LOOP
+    EXECUTE format('ALTER TABLE %s DETACH PARTITION %I.%I', v_parent, v_child.nspname, v_child.relname);
+    EXECUTE format('DROP TABLE %I.%I', v_child.nspname, v_child.relname);
+    v_dropped := v_dropped + 1;
+  END LOOP;
+
+  EXECUTE format('DELETE FROM %I.%I WHERE %I < $1', v_schema, v_table || '_default', v_column)
+    USING v_cutoff;
+
+  RETURN v_dropped;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ==========================
+-- Función: maintain_time_partitions
+-- ==========================
+-- Mantenimiento periódico para todas las tablas de time_partition_config:
+--   1. aplica la retención (si está configurada),
+--   2. crea particiones para los meses que hayan caído en la partición default,
+--   3. crea por adelantado las particiones del mes actual + premake_months.
+-- Pensada para ejecutarse a diario (p. ej. con pg_cron) y al inicio de cada ingesta:
+--   SELECT * FROM maintain_time_partitions();
+CREATE OR REPLACE FUNCTION maintain_time_partitions()
+RETURNS TABLE (parent_table varchar, partitions_created integer, partitions_dropped integer) AS $$
+DECLARE
+  v_cfg record;
+  v_month date;
+  v_created integer;
+  v_dropped integer;
+BEGIN
+  FOR v_cfg IN SELECT * FROM time_partition_config ORDER BY 1 LOOP
+    v_created := 0;
+    v_dropped := 0;
+
+    IF v_cfg.retention_months IS NOT NULL THEN
+      v_dropped := drop_expired_partitions(v_cfg.parent_table, v_cfg.retention_months);
+    END IF;
+
+    FOR v_month IN EXECUTE format('SELECT DISTINCT date_trunc(''month'', %I)::date FROM %I',
+                                  v_cfg.partition_column, v_cfg.parent_table || '_default')
+    LOOP
+      v_created := v_created + create_monthly_partitions(v_cfg.parent_table, v_month, v_month);
+    END LOOP;
+
+    v_created := v_created + create_monthly_partitions(
+      v_cfg.parent_table,
+      current_date,
+      (date_trunc('month', current_date) + make_interval(months => v_cfg.premake_months))::date
+    );
+
+    parent_table := v_cfg.parent_table;
+    partitions_created := v_created;
+    partitions_dropped := v_dropped;
+    RETURN NEXT;
+  END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ==========================
+-- Función: latest_partition_date
+-- ==========================
+-- Fecha más reciente de una tabla particionada sin recorrer toda la historia
+-- (los índices BRIN no resuelven max()): revisa las particiones mensuales de la más
+-- nueva a la más vieja y se detiene en la primera con filas; incluye la default.
+-- La usa src/features/build_features.py para anclar su ventana de lookback.
+CREATE OR REPLACE FUNCTION latest_partition_date(p_parent text)
+RETURNS date AS $$
+DECLARE
+  v_parent regclass := p_parent::regclass;
+  v_schema text;
+  v_table text;
+  v_column text;
+  v_child record;
+  v_latest date;
+  v_default_latest date;
+BEGIN
+  SELECT n.nspname, c.relname INTO v_schema, v_table
+  FROM pg_class c
+  JOIN pg_namespace n ON n.oid = c.relnamespace
+  WHERE c.oid = v_parent;
+
+  SELECT partition_column INTO v_column
+  FROM time_partition_config
+  WHERE parent_table = v_table;
+
+  IF v_column IS NULL THEN
+    RAISE EXCEPTION 'La tabla % no está registrada en time_partition_config', p_parent;
+  END IF;
+
+  EXECUTE format('SELECT max(%I) FROM %I.%I', v_column, v_schema, v_table || '_default')
+    INTO v_default_latest;
+
+  FOR v_child IN
+    SELECT n.nspname, c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE i.inhparent = v_parent
+      AND c.relname ~ ('^' || v_table || '_p[0-9]{6}$')
+    ORDER BY c.relname DESC
+  LOOP
+    EXECUTE format('SELECT max(%I) FROM %I.%I', v_column, v_child.nspname, v_child.relname)
+      INTO v_latest;
+    EXIT WHEN v_latest IS NOT NULL;
+  END LOOP;
+
+  RETURN GREATEST(v_latest, v_default_latest);
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- ==========================
+-- Paso 1: apartar las tablas heap actuales
+-- ==========================
+-- Las vistas dependen de payments/delinquencies; se recrean al final.
+DROP VIEW IF EXISTS vw_loan_summary;
+DROP VIEW IF EXISTS vw_monthly_balances;
+
+ALTER TABLE payments RENAME TO payments_legacy;
+ALTER INDEX payments_pkey RENAME TO payments_legacy_pkey;
+DROP INDEX IF EXISTS idx_payments_loan_id;
+DROP INDEX IF EXISTS idx_payments_payment_date;
+
+ALTER TABLE delinquencies RENAME TO delinquencies_legacy;
+ALTER INDEX delinquencies_pkey RENAME TO delinquencies_legacy_pkey;
+DROP INDEX IF EXISTS idx_delinquencies_loan_id;
+DROP INDEX IF EXISTS idx_delinquencies_as_of_date;
+DROP INDEX IF EXISTS idx_delinquencies_default_flag;
+
+ALTER TABLE predictions RENAME TO predictions_legacy;
+ALTER INDEX predictions_pkey RENAME TO predictions_legacy_pkey;
+DROP INDEX IF EXISTS idx_predictions_loan_snapshot;
+DROP INDEX IF EXISTS idx_predictions_run;
+
+-- ==========================
+-- Paso 2: tablas particionadas
+-- ==========================
+-- En una tabla particionada la PK debe incluir la columna de partición.
+CREATE TABLE payments (
+    payment_id uuid NOT NULL DEFAULT gen_random_uuid(),
+    loan_id uuid NOT NULL REFERENCES loans(loan_id) ON DELETE CASCADE,
+    payment_date date NOT NULL,
+    payment_amount numeric(14,2) NOT NULL,
+    payment_method varchar(50),
+    balance_after numeric(14,2),
+    created_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (payment_id, payment_date),
+    CONSTRAINT chk_payment_nonnegative CHECK (payment_amount >= 0)
+) PARTITION BY RANGE (payment_date);
+
+CREATE TABLE delinquencies (
+    delinquency_id uuid NOT NULL DEFAULT gen_random_uuid(),
+    loan_id uuid NOT NULL REFERENCES loans(loan_id) ON DELETE CASCADE,
+    as_of_date date NOT NULL,
+    days_past_due integer DEFAULT 0,
+    d30 boolean DEFAULT false,
+    d60 boolean DEFAULT false,
+    d90 boolean DEFAULT false,
+    default_flag boolean DEFAULT false,
+    default_date date,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (delinquency_id, as_of_date)
+) PARTITION BY RANGE (as_of_date);
+
+CREATE TABLE predictions (
+    prediction_id uuid NOT NULL DEFAULT gen_random_uuid(),
+    run_id uuid REFERENCES model_runs(run_id) ON DELETE SET NULL,
+    loan_id uuid REFERENCES loans(loan_id) ON DELETE SET NULL,
+    snapshot_date date NOT NULL,
+    probability numeric(6,4) NOT NULL,
+    threshold numeric(6,4),
+    predicted_label boolean,
+    explain_json jsonb, -- p.ej. top features y valores (SHAP-like)
+    created_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (prediction_id, snapshot_date)
+) PARTITION BY RANGE (snapshot_date);
+
+-- La partición default atrapa fechas sin partición mensual (nunca falla un INSERT);
+-- maintain_time_partitions() las mueve a su partición en la siguiente ejecución.
+CREATE TABLE payments_default PARTITION OF payments DEFAULT;
+CREATE TABLE delinquencies_default PARTITION OF delinquencies DEFAULT;
+CREATE TABLE predictions_default PARTITION OF predictions DEFAULT;
+
+-- Particiones para toda la historia existente (sin filas no se crea ninguna)...
+SELECT create_monthly_partitions('payments',
+    (SELECT min(payment_date) FROM payments_legacy), (SELECT max(payment_date) FROM payments_legacy));
+SELECT create_monthly_partitions('delinquencies',
+    (SELECT min(as_of_date) FROM delinquencies_legacy), (SELECT max(as_of_date) FROM delinquencies_legacy));
+SELECT create_monthly_partitions('predictions',
+    (SELECT min(snapshot_date) FROM predictions_legacy), (SELECT max(snapshot_date) FROM predictions_legacy));
+
+-- ...y las del mes actual + premake_months, según time_partition_config.
+SELECT * FROM maintain_time_partitions();
+
+-- ==========================
+-- Paso 3: copiar los datos
+-- ==========================
+-- Se insertan ordenados por fecha para que los índices BRIN queden bien correlacionados.
+INSERT INTO payments SELECT * FROM payments_legacy ORDER BY payment_date;
+INSERT INTO delinquencies SELECT * FROM delinquencies_legacy ORDER BY as_of_date;
+INSERT INTO predictions SELECT * FROM predictions_legacy ORDER BY snapshot_date;
+
+DROP TABLE payments_legacy;
+DROP TABLE delinquencies_legacy;
+DROP TABLE predictions_legacy;
+
+-- ==========================
+-- Paso 4: índices
+-- ==========================
+-- Los índices creados en la tabla padre se propagan a cada partición (y a las futuras).
+-- BRIN en las fechas: guarda min/max por bloque de páginas, ideal para datos que llegan en orden.
+CREATE INDEX IF NOT EXISTS idx_payments_loan_id ON payments (loan_id);
+CREATE INDEX IF NOT EXISTS idx_payments_payment_date_brin ON payments
+    USING brin (payment_date) WITH (pages_per_range = 32);
+
+CREATE INDEX IF NOT EXISTS idx_delinquencies_loan_id ON delinquencies (loan_id);
+CREATE INDEX IF NOT EXISTS idx_delinquencies_default_flag ON delinquencies (default_flag);
+CREATE INDEX IF NOT EXISTS idx_delinquencies_as_of_date_brin ON delinquencies
+    USING brin (as_of_date) WITH (pages_per_range = 32);
+
+CREATE INDEX IF NOT EXISTS idx_predictions_loan_snapshot ON predictions (loan_id, snapshot_date);
+CREATE INDEX IF NOT EXISTS idx_predictions_run ON predictions (run_id);
+CREATE INDEX IF NOT EXISTS idx_predictions_snapshot_date_brin ON predictions
+    USING brin (snapshot_date) WITH (pages_per_range = 32);
+
+-- ==========================
+-- Paso 5: vistas y comentarios
+-- ==========================
+-- Mismas definiciones que en schema.sql. Para consultas por rango de fechas usar
+-- fn_monthly_balances / fn_loan_summary, que sí permiten partition pruning.
+CREATE OR REPLACE VIEW vw_monthly_balances AS
+SELECT
+  l.loan_id,
+  date_trunc('month', p.payment_date)::date AS month,
+  SUM(p.payment_amount) AS total_paid_in_month,
+  MAX(p.balance_after) AS closing_balance
+FROM loans l
+LEFT JOIN payments p ON p.loan_id = l.loan_id
+GROUP BY l.loan_id, date_trunc('month', p.payment_date);
+
+CREATE OR REPLACE VIEW vw_loan_summary AS
+SELECT
+  l.loan_id,
+  l.account_id,
+  l.origination_date,
+  l.principal_amount,
+  l.outstanding_balance,
+  l.term_months,
+  l.interest_rate,
+  COUNT(p.payment_id) FILTER (WHERE p.payment_date IS NOT NULL) AS n_payments,
+  MAX(d.days_past_due) AS max_days_past_due,
+  MAX(d.default_flag::int) AS ever_defaulted
+FROM loans l
+LEFT JOIN payments p ON p.loan_id = l.loan_id
+LEFT JOIN delinquencies d ON d.loan_id = l.loan_id
+GROUP BY l.loan_id;
+
+COMMENT ON TABLE delinquencies IS 'Registro de delinquencias y target de default (particionada por mes en as_of_date)';
+COMMENT ON TABLE payments IS 'Pagos (particionada por mes en payment_date)';
+COMMENT ON TABLE predictions IS 'Predicciones (particionada por mes en snapshot_date)';
+COMMENT ON TABLE time_partition_config IS 'Configuración de particionado mensual y retención';
+
+ANALYZE payments;
+ANALYZE delinquencies;
+ANALYZE predictions;
+
+COMMIT;
@@ -75,6 +75,8 @@ CREATE INDEX IF NOT EXISTS idx_loans_origination_date ON loans (origination_date
 -- ==========================
 -- Tabla: payments
 -- ==========================
+-- Nota: migrations/001_partition_time_series.sql convierte payments, delinquencies y
+-- predictions en tablas particionadas por mes (con índices BRIN en las fechas).
 CREATE TABLE IF NOT EXISTS payments (
     payment_id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
     loan_id uuid NOT NULL REFERENCES loans(loan_id) ON DELETE CASCADE,
@@ -242,6 +244,64 @@ LEFT JOIN payments p ON p.loan_id = l.loan_id
 LEFT JOIN delinquencies d ON d.loan_id = l.loan_id
 GROUP BY l.loan_id;
 
+-- Versiones acotadas por fechas [p_from, p_to) de las vistas anteriores.
+-- Son funciones SQL "inlineables": el planner sustituye los parámetros y, si las tablas
+-- están particionadas, solo lee las particiones del rango (partition pruning).
+-- fn_monthly_balances omite los loans sin pagos en el rango.
+CREATE OR REPLACE FUNCTION fn_monthly_balances(p_from date, p_to date)
+RETURNS TABLE (loan_id uuid, month date, total_paid_in_month numeric, closing_balance numeric) AS $$
+  SELECT
+    p.loan_id,
+    date_trunc('month', p.payment_date)::date AS month,
+    SUM(p.payment_amount) AS total_paid_in_month,
+    MAX(p.balance_after) AS closing_balance
+  FROM payments p
+  WHERE p.payment_date >= p_from AND p.payment_date < p_to
+  GROUP BY p.loan_id, date_trunc('month', p.payment_date);
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION fn_loan_summary(p_from date, p_to date)
+RETURNS TABLE (
+  loan_id uuid,
+  account_id uuid,
+  origination_date date,
+  principal_amount numeric,
+  outstanding_balance numeric,
+  term_months integer,
+  interest_rate numeric,
+  n_payments bigint,
+  max_days_past_due integer,
+  ever_defaulted integer
+) AS $$
+  SELECT
+    l.loan_id,
+    l.account_id,
+    l.origination_date,
+    l.principal_amount,
+    l.outstanding_balance,
+    l.term_months,
+    l.interest_rate,
+    COALESCE(p.n_payments, 0) AS n_payments,
+    d.max_days_past_due,
+    d.ever_defaulted
+  FROM loans l
+  -- Cada tabla se agrega por separado: unir pagos x delinquencias multiplicaría las filas.
+  LEFT JOIN (
+    SELECT loan_id, COUNT(*) AS n_payments
+    FROM payments
+    WHERE payment_date >= p_from AND payment_date < p_to
+    GROUP BY loan_id
+  ) p ON p.loan_id = l.loan_id
+  LEFT JOIN (
+    SELECT loan_id,
+           MAX(days_past_due) AS max_days_past_due,
+           MAX(default_flag::int) AS ever_defaulted
+    FROM delinquencies
+    WHERE as_of_date >= p_from AND as_of_date < p_to
+    GROUP BY loan_id
+  ) d ON d.loan_id = l.loan_id;
+$$ LANGUAGE sql STABLE;
+
 -- ==========================
 -- Fin del schema
 -- ==========================
@@ -0,0 +1,307 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+# build_features.py es un script (no un paquete): se importa desde su carpeta para
+# medir exactamente las mismas consultas que envía.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "features"))
+from build_features import (  # noqa: E402
+    ANCHOR_QUERY_HEAP,
+    ANCHOR_QUERY_PARTITIONED,
+    FEATURES_QUERY,
+    LOOKBACK_FILTER,
+    lookback_since,
+)
+
+# Benchmark reproducible: heap (schema.sql) vs. particionado mensual + BRIN
+# (migrations/001_partition_time_series.sql).
+# Crea dos esquemas aislados (bench_heap y bench_part) en la BD del .env, carga en ambos
+# la MISMA historia sintética (semilla fija) y compara EXPLAIN ANALYZE de consultas típicas.
+# No toca las tablas del esquema public.
+#
+# Uso: python src/etl/benchmark_partitioning.py --loans 20000 --months 36 --runs 5
+
+load_dotenv()
+
+# --- 1. CONFIGURACIÓN DE LA CONEXIÓN ---
+DB_USER = os.getenv("POSTGRES_USER")
+DB_PASS = os.getenv("POSTGRES_PASSWORD")
+DB_HOST = os.getenv("POSTGRES_HOST")
+DB_PORT = os.getenv("POSTGRES_PORT")
+DB_NAME = os.getenv("POSTGRES_DB")
+
+if not all([DB_USER, DB_PASS, DB_HOST, DB_PORT, DB_NAME]):
+    print("Error: Faltan variables de entorno en el archivo .env")
+    sys.exit(1)
+
+DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# --- 2. RUTAS DE ARCHIVOS ---
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(os.path.dirname(CURRENT_DIR))
+SCHEMA_PATH = os.path.join(BASE_DIR, "schema.sql")
+MIGRATION_PATH = os.path.join(BASE_DIR, "migrations", "001_partition_time_series.sql")
+
+HEAP_SCHEMA = "bench_heap"
+PART_SCHEMA = "bench_part"
+SEED = 0.42
+FEATURES_LOOKBACK_MONTHS = 12
+
+# Consulta del ancla de build_features en cada layout.
+ANCHOR_QUERIES = {HEAP_SCHEMA: ANCHOR_QUERY_HEAP, PART_SCHEMA: ANCHOR_QUERY_PARTITIONED}
+
+# --- 3. HISTORIA SINTÉTICA ---
+# Se inserta mes a mes (como llegan los datos en producción), que es el orden
+# que aprovechan los índices BRIN. Se ejecuta con exec_driver_sql, por eso usa
+# parámetros del driver (%(x)s) y '%%' para el operador módulo.
+SYNTHETIC_HISTORY_SQL = """
+SELECT setseed(%(seed)s);
+
+INSERT INTO customers (external_customer_id, gender, job, region)
+SELECT 'SYN-' || g,
+       (ARRAY['male', 'female'])[1 + g %% 2]::gender_type,
+       (ARRAY['unskilled', 'skilled', 'highly skilled'])[1 + g %% 3],
+       'region-' || (g %% 10)
+FROM generate_series(1, %(loans)s) AS g;
+
+INSERT INTO accounts (customer_id, account_type, account_open_date, account_status)
+SELECT customer_id, 'checking', %(start)s, 'active' FROM customers;
+
+INSERT INTO loans (account_id, product_type, origination_date, principal_amount,
+                   outstanding_balance, term_months, interest_rate)
+SELECT account_id, 'car', %(start)s, round((1000 + random() * 9000)::numeric, 2),
+       0, %(months)s, 0.0750
+FROM accounts;
+
+INSERT INTO payments (loan_id, payment_date, payment_amount, payment_method, balance_after)
+SELECT l.loan_id,
+       (%(start)s::date + make_interval(months => m))::date + (random() * 27)::int,
+       round((l.principal_amount / %(months)s)::numeric, 2),
+       'transfer',
+       round((l.principal_amount * (1 - (m + 1)::numeric / %(months)s))::numeric, 2)
+FROM generate_series(0, %(months)s - 1) AS m
+CROSS JOIN loans l
+ORDER BY m;
+
+INSERT INTO delinquencies (loan_id, as_of_date, days_past_due, d30, d60, d90, default_flag)
+SELECT loan_id, as_of_date, dpd, dpd >= 30, dpd >= 60, dpd >= 90, dpd > 90
+FROM (
+    SELECT l.loan_id,
+           ((%(start)s::date + make_interval(months => m + 1))::date - 1) AS as_of_date,
+           CASE WHEN random() < 0.1 THEN (random() * 120)::int ELSE 0 END AS dpd,
+           m
+    FROM generate_series(0, %(months)s - 1) AS m
+    CROSS JOIN loans l
+) AS s
+ORDER BY m;
+
+INSERT INTO predictions (loan_id, snapshot_date, probability, threshold, predicted_label)
+SELECT loan_id, snapshot_date, probability, 0.5, probability >= 0.5
+FROM (
+    SELECT l.loan_id,
+           (%(start)s::date + make_interval(months => m))::date AS snapshot_date,
+           round(random()::numeric, 4) AS probability,
+           m
+    FROM generate_series(0, %(months)s - 1) AS m
+    CROSS JOIN loans l
+) AS s
+ORDER BY m;
+"""
+
+
+def add_months(d, months):
+    """Primer día del mes desplazado 'months' meses desde 'd'."""
+    total = d.year * 12 + (d.month - 1) + months
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def build_queries(current_month):
+    """Consultas a comparar (mismo SQL en ambos layouts, con fechas literales)."""
+    last_month = add_months(current_month, -1)
+    last_quarter = add_months(current_month, -3)
+    last_year = add_months(current_month, -12)
+    return {
+        "payments: un mes": f"""
+            SELECT count(*), sum(payment_amount) FROM payments
+            WHERE payment_date >= '{last_month}' AND payment_date < '{current_month}'""",
+        "payments: último trimestre por loan": f"""
+            SELECT loan_id, sum(payment_amount) FROM payments
+            WHERE payment_date >= '{last_quarter}' GROUP BY loan_id""",
+        "delinquencies: tasa de default mensual (12m)": f"""
+            SELECT date_trunc('month', as_of_date), avg(default_flag::int) FROM delinquencies
+            WHERE as_of_date >= '{last_year}' GROUP BY 1""",
+        "predictions: un snapshot": f"""
+            SELECT count(*), avg(probability) FROM predictions
+            WHERE snapshot_date = '{last_month}'""",
+        "fn_monthly_balances (trimestre)": f"""
+            SELECT * FROM fn_monthly_balances('{last_quarter}', '{current_month}')""",
+        "fn_loan_summary (trimestre)": f"""
+            SELECT * FROM fn_loan_summary('{last_quarter}', '{current_month}')""",
+    }
+
+
+def run_sql_file(conn, path):
+    """Ejecuta un archivo .sql completo (varias sentencias, bloques DO $$...$$)."""
+    with open(path, encoding="utf-8") as f:
+        # no_parameters: el SQL se pasa tal cual al driver, sin interpretar los '%' de format().
+        conn.execution_options(no_parameters=True).exec_driver_sql(f.read())
+
+
+def prepare_schema(conn, schema, partitioned, loans, months, start, current_month):
+    """Crea el esquema desde cero y carga la historia sintética."""
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {schema}"))
+    conn.execute(text(f"SET search_path TO {schema}, public"))
+    run_sql_file(conn, SCHEMA_PATH)
+
+    if partitioned:
+        run_sql_file(conn, MIGRATION_PATH)
+        for table in ("payments", "delinquencies", "predictions"):
+            conn.execute(text("SELECT create_monthly_partitions(:table, :start, :end)"),
+                         {"table": table, "start": start, "end": current_month})
+
+    started = time.perf_counter()
+    conn.exec_driver_sql(SYNTHETIC_HISTORY_SQL,
+                         {"seed": SEED, "loans": loans, "months": months, "start": start})
+    print(f"  [{schema}] historia cargada en {time.perf_counter() - started:.1f}s")
+
+    for table in ("customers", "accounts", "loans", "payments", "delinquencies", "predictions"):
+        conn.execute(text(f"VACUUM ANALYZE {table}"))
+
+    size = conn.execute(
+        text("SELECT pg_size_pretty(sum(pg_total_relation_size(c.oid))) "
+             "FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+             "WHERE n.nspname = :schema AND c.relkind = 'r'"),
+        {"schema": schema},
+    ).scalar()
+    print(f"  [{schema}] tamaño total (tablas + índices): {size}")
+
+
+def build_features_queries(conn):
+    """Las consultas reales de build_features.py (ancla + extracción) para cada layout.
+
+    Como en build_features, ':since' se calcula con el ancla de cada layout y se envía
+    como parámetro literal.
+    """
+    queries = {"build_features: ancla": {}, f"build_features (ventana {FEATURES_LOOKBACK_MONTHS}m)": {}}
+    for schema, anchor_sql in ANCHOR_QUERIES.items():
+        conn.execute(text(f"SET search_path TO {schema}, public"))
+        anchor = conn.execute(text(anchor_sql)).scalar()
+        since = lookback_since(anchor, FEATURES_LOOKBACK_MONTHS)
+        queries["build_features: ancla"][schema] = (anchor_sql, {})
+        queries[f"build_features (ventana {FEATURES_LOOKBACK_MONTHS}m)"][schema] = (
+            FEATURES_QUERY + LOOKBACK_FILTER, {"since": since})
+    return queries
+
+
+def explain(conn, schema, sql, runs, params=None):
+    """Mediana de Planning Time y Execution Time de EXPLAIN ANALYZE."""
+    planning, execution = [], []
+    conn.execute(text(f"SET search_path TO {schema}, public"))
+    for _ in range(runs):
+        plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"),
+                            params or {}).scalar()[0]
+        planning.append(plan["Planning Time"])
+        execution.append(plan["Execution Time"])
+    return statistics.median(planning), statistics.median(execution)
+
+
+def explain_text(conn, schema, sql, params=None):
+    """Plan legible de EXPLAIN (ANALYZE, BUFFERS) para inspeccionar el pruning."""
+    conn.execute(text(f"SET search_path TO {schema}, public"))
+    rows = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"), params or {}).fetchall()
+    return "\n".join(row[0] for row in rows)
+
+
+def time_retention(engine, schema, partitioned, retention_months, cutoff):
+    """Tiempo de la retención (DELETE vs. DROP de particiones), revertido con ROLLBACK."""
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            conn.execute(text(f"SET LOCAL search_path TO {schema}, public"))
+            started = time.perf_counter()
+            if partitioned:
+                conn.execute(text("SELECT drop_expired_partitions('payments', :months)"),
+                             {"months": retention_months})
+            else:
+                conn.execute(text("DELETE FROM payments WHERE payment_date < :cutoff"),
+                             {"cutoff": cutoff})
+            return (time.perf_counter() - started) * 1000
+        finally:
+            trans.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark heap vs. particionado mensual + BRIN")
+    parser.add_argument("--loans", type=int, default=20000, help="número de préstamos sintéticos")
+    parser.add_argument("--months", type=int, default=36, help="meses de historia por préstamo")
+    parser.add_argument("--runs", type=int, default=5, help="repeticiones de cada EXPLAIN ANALYZE")
+    parser.add_argument("--retention", type=int, default=24, help="meses a conservar en la prueba de retención")
+    parser.add_argument("--show-plans", action="store_true", help="imprime el último plan de cada consulta")
+    parser.add_argument("--keep", action="store_true", help="no borra los esquemas al terminar")
+    args = parser.parse_args()
+
+    print("Iniciando benchmark de particionado...")
+    current_month = date.today().replace(day=1)
+    start = add_months(current_month, -(args.months - 1))
+    print(f"Historia sintética: {args.loans} loans x {args.months} meses ({start} a {current_month})")
+
+    engine = create_engine(DATABASE_URL)
+    # AUTOCOMMIT: VACUUM no puede correr dentro de una transacción.
+    conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+    try:
+        # --- 4. CARGA DE AMBOS LAYOUTS ---
+        print("Preparando layout heap (antes)...")
+        prepare_schema(conn, HEAP_SCHEMA, False, args.loans, args.months, start, current_month)
+        print("Preparando layout particionado (después)...")
+        prepare_schema(conn, PART_SCHEMA, True, args.loans, args.months, start, current_month)
+
+        # --- 5. EXPLAIN ANALYZE ---
+        print(f"\nMediana de {args.runs} ejecuciones (ms):")
+        header = f"{'consulta':<46}{'heap plan':>11}{'heap exec':>11}{'part plan':>11}{'part exec':>11}{'speedup':>9}"
+        print(header)
+        print("-" * len(header))
+        # Cada consulta: {esquema: (sql, params)}; las de build_features difieren por layout.
+        queries = {name: {HEAP_SCHEMA: (sql, {}), PART_SCHEMA: (sql, {})}
+                   for name, sql in build_queries(current_month).items()}
+        queries.update(build_features_queries(conn))
+        for name, by_schema in queries.items():
+            heap_sql, heap_params = by_schema[HEAP_SCHEMA]
+            part_sql, part_params = by_schema[PART_SCHEMA]
+            heap_plan, heap_exec = explain(conn, HEAP_SCHEMA, heap_sql, args.runs, heap_params)
+            part_plan, part_exec = explain(conn, PART_SCHEMA, part_sql, args.runs, part_params)
+            speedup = (heap_plan + heap_exec) / max(part_plan + part_exec, 1e-9)
+            print(f"{name:<46}{heap_plan:>11.2f}{heap_exec:>11.2f}{part_plan:>11.2f}{part_exec:>11.2f}{speedup:>8.1f}x")
+            if args.show_plans:
+                for schema, (sql, params) in by_schema.items():
+                    print(f"\n  [{schema}]\n{explain_text(conn, schema, sql, params)}\n")
+
+        # --- 6. RETENCIÓN ---
+        cutoff = add_months(current_month, -args.retention)
+        heap_ms = time_retention(engine, HEAP_SCHEMA, False, args.retention, cutoff)
+        part_ms = time_retention(engine, PART_SCHEMA, True, args.retention, cutoff)
+        print(f"\nRetención de payments anteriores a {cutoff} (wall-clock, revertida):")
+        print(f"  heap  DELETE:           {heap_ms:>10.2f} ms")
+        print(f"  part  DROP particiones: {part_ms:>10.2f} ms")
+
+        if not args.keep:
+            conn.execute(text(f"DROP SCHEMA {HEAP_SCHEMA} CASCADE"))
+            conn.execute(text(f"DROP SCHEMA {PART_SCHEMA} CASCADE"))
+
+        print("\n--- ¡Benchmark completo! ---")
+
+    except Exception as e:
+        print(f"Ha ocurrido un error durante el benchmark: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
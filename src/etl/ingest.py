@@ -53,6 +53,16 @@ def main():
             conn.execute(text("TRUNCATE TABLE customers RESTART IDENTITY CASCADE"))
             print("Tablas limpiadas.")
 
+        # Si la migración de particionado está aplicada, nos aseguramos de que existan
+        # las particiones mensuales (y de aplicar la retención) antes de cargar.
+        with engine.begin() as conn:
+            has_partitions = conn.execute(
+                text("SELECT to_regprocedure('maintain_time_partitions()') IS NOT NULL")
+            ).scalar()
+            if has_partitions:
+                print("Manteniendo particiones mensuales...")
+                conn.execute(text("SELECT * FROM maintain_time_partitions()"))
+
         # --- 5. TRANSFORMACIÓN (Transform) ---
         
         # --- ETAPA 1: CUSTOMERS ---
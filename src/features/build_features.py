@@ -1,5 +1,5 @@
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 import sys
 import os
 from datetime import datetime
@@ -21,11 +21,60 @@ if not all([DB_USER, DB_PASS, DB_HOST, DB_PORT, DB_NAME]):
 
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# (Opcional) Meses de historia de 'delinquencies' que se leen, contados hacia atrás
+# desde la fecha más reciente en los datos. Al filtrar por as_of_date, Postgres
+# descarta las particiones fuera de la ventana (partition pruning).
+# Si no está definida, se lee toda la historia.
+LOOKBACK_MONTHS = os.getenv("FEATURES_LOOKBACK_MONTHS") or None
+
+if LOOKBACK_MONTHS is not None:
+    if not LOOKBACK_MONTHS.strip().isdigit() or int(LOOKBACK_MONTHS) <= 0:
+        print(f"Error: FEATURES_LOOKBACK_MONTHS debe ser un entero positivo (recibido: '{LOOKBACK_MONTHS}')")
+        sys.exit(1)
+    LOOKBACK_MONTHS = int(LOOKBACK_MONTHS)
+
 # --- 2. RUTAS DE ARCHIVOS ---
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 BASE_DIR = os.path.dirname(os.path.dirname(CURRENT_DIR))
 DATA_OUTPUT_PATH = os.path.join(BASE_DIR, "data", "training_dataset.csv")
 
+# --- CONSULTAS (también las usa src/etl/benchmark_partitioning.py) ---
+FEATURES_QUERY = """
+        SELECT c.job, c.gender, c.birth_date,
+               l.principal_amount, l.term_months, l.product_type,
+               d.default_flag
+        FROM loans l
+        JOIN accounts a ON l.account_id = a.account_id
+        JOIN customers c ON a.customer_id = c.customer_id
+        JOIN delinquencies d ON l.loan_id = d.loan_id
+        """
+
+# ':since' se envía como literal, así Postgres descarta al planificar las
+# particiones fuera de la ventana.
+LOOKBACK_FILTER = """
+        WHERE d.as_of_date > :since
+        """
+
+# Ancla de la ventana: la fecha más reciente de delinquencies. Con la migración de
+# particionado, max() tendría que leer todas las particiones (BRIN no lo resuelve),
+# así que se usa latest_partition_date(), que solo lee las más recientes.
+ANCHOR_QUERY_PARTITIONED = "SELECT latest_partition_date('delinquencies')"
+ANCHOR_QUERY_HEAP = "SELECT max(as_of_date) FROM delinquencies"
+
+
+def anchor_query(conn):
+    """Consulta del ancla según si la migración de particionado está aplicada."""
+    has_partitions = conn.execute(
+        text("SELECT to_regprocedure('latest_partition_date(text)') IS NOT NULL")
+    ).scalar()
+    return ANCHOR_QUERY_PARTITIONED if has_partitions else ANCHOR_QUERY_HEAP
+
+
+def lookback_since(anchor, months):
+    """Inicio (exclusivo) de la ventana de 'months' meses que termina en 'anchor'."""
+    return (pd.Timestamp(anchor) - pd.DateOffset(months=months)).date()
+
+
 def main():
     print("Iniciando script 'Ingeniería de Características' (vFinal - Con .env)...")
     
@@ -34,18 +83,25 @@ def main():
         print("Conectando a la base de datos...")
         engine = create_engine(DATABASE_URL)
         
-        QUERY = """
-        SELECT c.job, c.gender, c.birth_date,
-               l.principal_amount, l.term_months, l.product_type,
-               d.default_flag
-        FROM loans l
-        JOIN accounts a ON l.account_id = a.account_id
-        JOIN customers c ON a.customer_id = c.customer_id
-        JOIN delinquencies d ON l.loan_id = d.loan_id;
-        """
-        df = pd.read_sql(QUERY, engine)
+        QUERY = FEATURES_QUERY
+        params = {}
+        if LOOKBACK_MONTHS is not None:
+            with engine.connect() as conn:
+                anchor = conn.execute(text(anchor_query(conn))).scalar()
+            if anchor is None:
+                print("Error: La tabla 'delinquencies' está vacía.")
+                sys.exit(1)
+            QUERY += LOOKBACK_FILTER
+            params["since"] = lookback_since(anchor, LOOKBACK_MONTHS)
+            print(f"Leyendo los últimos {LOOKBACK_MONTHS} meses de delinquencies "
+                  f"(de {params['since']} a {anchor})...")
+        df = pd.read_sql(text(QUERY), engine, params=params)
         print(f"Datos crudos cargados: {len(df)} filas.")
 
+        if df.empty:
+            print("Error: La consulta no devolvió filas; no se generará un dataset vacío.")
+            sys.exit(1)
+
         # --- 4. TRADUCCIÓN (Feature Engineering) ---
         print("Traduciendo datos a formato numérico...")
 